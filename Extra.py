@@ -1,19 +1,117 @@
+import time
+_INICIO_SCRIPT = time.perf_counter()
+
 import os
 import re
+import sys
 import tempfile
 import shutil
+import importlib
+import hashlib
+import json
+import sqlite3
 from io import BytesIO
-import pandas as pd
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+from datetime import datetime, timezone
 import streamlit as st
-import pdfplumber
-from fpdf import FPDF
-from datetime import datetime
-from PIL import Image
-import zipfile
+
+# pandas, pdfplumber, fpdf, PIL e zipfile são importados sob demanda (ver importar_modulo),
+# apenas nos caminhos que realmente os utilizam
 
 # =================== CONFIGURAÇÃO ===================
+def silenciar_avisos_streamlit():
+    """Mantém apenas os erros nos logs do Streamlit (fora do servidor, cada chamada st.* gera um aviso)"""
+    # set_option carrega a configuração antes (a leitura dela redefine o nível do logger para "info")
+    configuracao = importlib.import_module('streamlit.config')
+    configuracao.set_option('logger.level', 'error')
+    configuracao.set_option('global.showWarningOnDirectExecution', False)
+    importlib.import_module('streamlit.logger').set_log_level('error')
+
+# Validação pela linha de comando (ver main_cli): silencia os avisos antes da primeira chamada st.*
+if __name__ == "__main__" and '--validar-corpus' in sys.argv[1:]:
+    silenciar_avisos_streamlit()
+
 st.set_page_config(page_title="CREA-RJ", layout="wide", page_icon="")
 
+LOGO_PATH = "10.png"
+
+# Diretório persistente para caches em disco (ex.: resultados de OCR por página)
+DIRETORIO_CACHE = os.environ.get("CREA_RF_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "crea_rf"))
+
+# OCR local (Tesseract) para RFs digitalizados. Dependências opcionais, fora do requirements.txt:
+# o pacote pytesseract e o executável tesseract com o idioma "por" (ex.: apt install tesseract-ocr-por)
+IDIOMA_OCR = "por"
+RESOLUCAO_OCR = 300
+
+# Índice de busca textual (SQLite FTS5) com as seções de todos os RFs já processados
+ARQUIVO_INDICE = os.path.join(DIRETORIO_CACHE, "indice_rfs.sqlite")
+
+# Assinaturas de imagens recorrentes (timbres, carimbos, assinaturas) aprendidas entre RFs: uma imagem
+# presente em ao menos MIN_RFS_DECORACAO RFs distintos deixa de ser extraída como foto. O limiar protege
+# fotos reais reaproveitadas em poucos RFs; acervos em que uma mesma foto se repete em muitos RFs
+# devem elevá-lo (CREA_RF_MIN_RFS_DECORACAO)
+ARQUIVO_ASSINATURAS = os.path.join(DIRETORIO_CACHE, "assinaturas_imagens.sqlite")
+MIN_RFS_DECORACAO = int(os.environ.get("CREA_RF_MIN_RFS_DECORACAO", 5))
+
+# Instante fixo usado nas saídas determinísticas (convenção SOURCE_DATE_EPOCH; padrão 01/01/1980,
+# a menor data aceita em arquivos ZIP)
+DATA_FIXA = datetime.fromtimestamp(int(os.environ.get("SOURCE_DATE_EPOCH", 315532800)), timezone.utc).replace(tzinfo=None)
+
+# Resultados parciais e artefatos em cache sem uso há mais de DIAS_RETENCAO_CACHE dias são removidos
+DIAS_RETENCAO_CACHE = int(os.environ.get("CREA_RF_CACHE_DIAS", 30))
+
+# Versão da lógica de extração: incrementar ao alterar a extração invalida os resultados parciais em cache
+VERSAO_EXTRACAO = 2
+
+# Colunas de baixa cardinalidade (codificadas como dicionário) e de contagens (inteiros) no buffer colunar
+COLUNAS_CATEGORICAS = ['Situação', 'Fiscal', 'Supervisão', 'Regularização', 'Tipo Visita',
+                       'Fiscal Nome Completo', 'Supervisão Sigla']
+COLUNAS_INTEIRAS = ['Ofício', 'Resposta Ofício', 'Ações', 'Fotos Extraídas', '_Autuações_Count']
+
+# Quantidade padrão de PDFs processados por lote na ingestão de ZIPs/pastas
+TAMANHO_LOTE_PADRAO = 50
+
+# Raiz das pastas do servidor que podem ser lidas diretamente (sem upload). Sem a variável de
+# ambiente, a opção "Pasta no servidor" não é oferecida. Os uploads (PDFs e ZIP) são limitados por
+# server.maxUploadSize (padrão 200 MB, em .streamlit/config.toml): acervos maiores devem ser
+# copiados para dentro desta raiz e lidos como pasta no servidor.
+PASTA_RAIZ_SERVIDOR = os.environ.get("CREA_RF_PASTA_RAIZ")
+
+# =================== CARREGAMENTO SOB DEMANDA ===================
+@st.cache_resource
+def registro_diagnostico():
+    """Registro persistente entre reruns com tempos de importação e de inicialização"""
+    return {'importacoes': {}, 'primeira_execucao': None}
+
+def importar_modulo(nome):
+    """Importa um módulo pesado apenas quando necessário, registrando o tempo da primeira importação"""
+    if nome in sys.modules:
+        return sys.modules[nome]
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nome)
+    registro_diagnostico()['importacoes'][nome] = time.perf_counter() - inicio
+    return modulo
+
+@st.cache_resource
+def carregar_logo():
+    """Carrega o logo uma única vez e o mantém em cache entre reruns"""
+    if not os.path.exists(LOGO_PATH):
+        return None
+    try:
+        Image = importar_modulo('PIL.Image')
+        with Image.open(LOGO_PATH) as img:
+            img.load()
+            return img.copy()
+    except:
+        return None
+
+@st.cache_resource
+def logo_disponivel():
+    """Verifica (uma única vez) se o arquivo do logo existe para uso nos relatórios"""
+    return os.path.exists(LOGO_PATH)
+
 # =================== FUNÇÕES AUXILIARES ===================
 def criar_temp_dir():
     """Cria diretório temporário"""
@@ -23,6 +121,13 @@ def limpar_temp_dir(temp_dir):
     """Remove diretório temporário"""
     shutil.rmtree(temp_dir, ignore_errors=True)
 
+def registrar_etapa(tempos, etapa, inicio):
+    """Acumula em tempos[etapa] o tempo decorrido desde inicio e retorna o instante atual"""
+    agora = time.perf_counter()
+    if tempos is not None:
+        tempos[etapa] = tempos.get(etapa, 0.0) + (agora - inicio)
+    return agora
+
 def is_empty_info(text):
     """Verifica se o texto indica informação ausente"""
     if not text or str(text).strip() == '':
@@ -218,9 +323,29 @@ def encontrar_pagina_secao_fotos(pdf):
             return page_num
     return None
 
-def extrair_todas_fotos_pdf(pdf_path, temp_dir, filename):
-    """Extrai TODAS as fotos del PDF de forma abrangente"""
+def assinatura_imagem(img, assinaturas_streams):
+    """Assinatura de uma imagem do PDF: hash do XObject (dados brutos, sem decodificar) e dimensões.
+    
+    assinaturas_streams memoriza a assinatura por stream, já que um mesmo XObject
+    (ex.: timbre) é referenciado em várias páginas e seus dados brutos são descartados ao decodificar.
+    """
+    stream = img.get('stream')
+    if stream is None:
+        return None
+    if id(stream) not in assinaturas_streams:
+        dados_brutos = stream.get_rawdata()
+        if dados_brutos is None:
+            dados_brutos = stream.get_data()
+        largura, altura = img.get('srcsize', (0, 0))
+        assinaturas_streams[id(stream)] = f"{hashlib.sha1(dados_brutos).hexdigest()}_{largura}x{altura}"
+    return assinaturas_streams[id(stream)]
+
+def extrair_todas_fotos_pdf(pdf_path, temp_dir, filename, decoracoes=None):
+    """Extrai TODAS as fotos del PDF de forma abrangente (decoracoes opcional: IndiceDecoracoes)"""
+    pdfplumber = importar_modulo('pdfplumber')
+    Image = importar_modulo('PIL.Image')
     fotos_extraidas = []
+    assinaturas_streams = {}
     pdf_name = os.path.splitext(filename)[0]
     fotos_dir = os.path.join(temp_dir, "fotos", pdf_name)
     os.makedirs(fotos_dir, exist_ok=True)
@@ -264,6 +389,15 @@ def extrair_todas_fotos_pdf(pdf_path, temp_dir, filename):
                             # Exclui imagens muito pequenas (menos de 50px)
                             if img['width'] < 50 or img['height'] < 50:
                                 continue
+                            
+                            # As imagens que passam pelas heurísticas têm a recorrência entre RFs registrada;
+                            # decorações conhecidas são descartadas antes de ler/decodificar o stream
+                            if decoracoes is not None:
+                                assinatura = assinatura_imagem(img, assinaturas_streams)
+                                if assinatura is not None:
+                                    decoracoes.observar(assinatura)
+                                    if decoracoes.eh_decoracao(assinatura):
+                                        continue
                                 
                             # Extrai a imagem
                             if 'stream' in img:
@@ -299,6 +433,51 @@ def extrair_todas_fotos_pdf(pdf_path, temp_dir, filename):
     
     return fotos_extraidas
 
+class IndiceDecoracoes:
+    """Índice persistente de assinaturas de imagens decorativas aprendidas entre RFs.
+    
+    As assinaturas das imagens aceitas pelas heurísticas de posição/tamanho em cada RF são gravadas
+    por registrar_arquivo(); as que aparecem em pelo menos MIN_RFS_DECORACAO RFs distintos passam a
+    ser tratadas como decoração. impressao identifica o conjunto de decorações conhecidas e entra
+    na chave dos resultados parciais, já que as fotos extraídas dependem dele.
+    """
+    
+    def __init__(self):
+        os.makedirs(os.path.dirname(ARQUIVO_ASSINATURAS), exist_ok=True)
+        self.con = sqlite3.connect(ARQUIVO_ASSINATURAS)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS ocorrencias_imagens (
+                assinatura TEXT NOT NULL,
+                arquivo TEXT NOT NULL,
+                PRIMARY KEY (assinatura, arquivo)
+            ) WITHOUT ROWID
+        """)
+        self.conhecidas = {assinatura for (assinatura,) in self.con.execute(
+            "SELECT assinatura FROM ocorrencias_imagens GROUP BY assinatura HAVING COUNT(*) >= ?",
+            (MIN_RFS_DECORACAO,)
+        )}
+        self.impressao = hashlib.sha256("\n".join(sorted(self.conhecidas)).encode('utf-8')).hexdigest()
+        self.vistas = set()
+    
+    def eh_decoracao(self, assinatura):
+        """Indica se a assinatura pertence a uma imagem decorativa conhecida"""
+        return assinatura in self.conhecidas
+    
+    def observar(self, assinatura):
+        """Registra uma assinatura vista no RF em processamento"""
+        self.vistas.add(assinatura)
+    
+    def registrar_arquivo(self, arquivo):
+        """Grava as assinaturas vistas no RF e reinicia a coleta para o próximo"""
+        self.con.executemany("INSERT OR IGNORE INTO ocorrencias_imagens (assinatura, arquivo) VALUES (?, ?)",
+                             [(assinatura, arquivo) for assinatura in self.vistas])
+        self.con.commit()
+        self.vistas = set()
+    
+    def fechar(self):
+        """Fecha a conexão com o índice"""
+        self.con.close()
+
 def melhorar_deteccao_secao_fotos(texto_completo):
     """Melhora a detecção da seção de fotos com padrões mais flexíveis"""
     padroes_fotos = [
@@ -399,10 +578,117 @@ def extrair_data_relatorio_anterior(texto):
     
     return ''
 
+# =================== OCR (RFs DIGITALIZADOS) ===================
+def hash_arquivo(caminho):
+    """Calcula o hash SHA-256 do conteúdo de um arquivo"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def extrair_textos_paginas(pdf_path):
+    """Extrai o texto de cada página do PDF (uma string por página)"""
+    pdfplumber = importar_modulo('pdfplumber')
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+def paginas_sem_texto(textos):
+    """Retorna as páginas sem texto quando o PDF não possui a identificação do RF na camada de texto.
+    
+    Páginas de fotos normalmente não têm texto, por isso só se consideram digitalizadas
+    as páginas de PDFs cuja camada de texto não traz o campo 'Número'.
+    """
+    if re.search(r'Número\s*:', "\n".join(textos)):
+        return []
+    return [page_num for page_num, texto in enumerate(textos) if not texto.strip()]
+
+def caminho_cache_ocr(hash_pdf, page_num):
+    """Caminho do cache em disco do OCR de uma página"""
+    return os.path.join(DIRETORIO_CACHE, "ocr", f"{hash_pdf}_pag{page_num + 1}_{RESOLUCAO_OCR}dpi_{IDIOMA_OCR}.txt")
+
+def ler_cache_ocr(hash_pdf, page_num):
+    """Lê o texto de OCR de uma página em cache (None se ainda não processada)"""
+    caminho = caminho_cache_ocr(hash_pdf, page_num)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def gravar_cache_ocr(hash_pdf, page_num, texto):
+    """Grava o texto de OCR de uma página no cache em disco"""
+    caminho = caminho_cache_ocr(hash_pdf, page_num)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(texto)
+
+def ocr_disponivel():
+    """Verifica se o pytesseract e o executável do Tesseract estão instalados"""
+    try:
+        pytesseract = importar_modulo('pytesseract')
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def ocr_pagina(pdf_path, page_num, trava_renderizacao):
+    """Renderiza uma página e executa o OCR local (executado nas threads do pool de OCR).
+    
+    A renderização (pypdfium2) não é thread-safe e é serializada pela trava; o OCR em si roda
+    no executável do Tesseract, em paralelo.
+    """
+    pdfplumber = importar_modulo('pdfplumber')
+    pytesseract = importar_modulo('pytesseract')
+    with trava_renderizacao:
+        with pdfplumber.open(pdf_path) as pdf:
+            imagem = pdf.pages[page_num].to_image(resolution=RESOLUCAO_OCR).original
+    return pytesseract.image_to_string(imagem, lang=IDIOMA_OCR)
+
+@st.cache_resource
+def pool_ocr():
+    """Pool de threads dedicado ao OCR e trava de renderização, mantidos entre reruns.
+    
+    Threads bastam: o pytesseract apenas executa o binário do Tesseract em um subprocesso.
+    """
+    return ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2)), threading.Lock()
+
+def agendar_ocr(pdf_path, filename, textos):
+    """Preenche com o cache as páginas sem texto e envia as demais ao pool de OCR.
+    
+    Retorna um dicionário {página: future} com as páginas que ainda dependem do OCR.
+    """
+    hash_pdf = hash_arquivo(pdf_path)
+    pool, trava_renderizacao = pool_ocr()
+    futuros = {}
+    for page_num in paginas_sem_texto(textos):
+        texto_cache = ler_cache_ocr(hash_pdf, page_num)
+        if texto_cache is not None:
+            textos[page_num] = texto_cache
+        else:
+            futuros[page_num] = pool.submit(ocr_pagina, pdf_path, page_num, trava_renderizacao)
+    if futuros:
+        st.info(f"OCR agendado para {len(futuros)} página(s) digitalizada(s) de {filename}")
+    return hash_pdf, futuros
+
+def concluir_ocr(filename, textos, hash_pdf, futuros):
+    """Aguarda o OCR das páginas pendentes, gravando os resultados no cache.
+    
+    Retorna a quantidade de páginas cujo OCR falhou (elas permanecem sem texto).
+    """
+    falhas = 0
+    for page_num, futuro in futuros.items():
+        try:
+            textos[page_num] = futuro.result()
+            gravar_cache_ocr(hash_pdf, page_num, textos[page_num])
+        except Exception as e:
+            falhas += 1
+            st.warning(f"⚠️ Erro no OCR da página {page_num + 1} de {filename}: {str(e)}")
+    return falhas
+
 # =================== MÓDULO DE EXTRAÇÃO ===================
-def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
-    """Extrai todos os dados del PDF de forma estruturada"""
-    dados = {
+def dados_vazios(filename):
+    """Modelo com todos os campos extraídos de um RF, na ordem das colunas da planilha"""
+    return {
         'RF': '', 'RF Principal': '', 'Situação': '', 'Fiscal': '', 'Supervisão': '', 
         'Data': '', 'Data ART': '', 'Fato Gerador': '', 'Protocolo': '', 'Tipo Visita': '',
         'Endereço Empreendimento - Latitude': '', 'Endereço Empreendimento - Longitude': '',
@@ -416,6 +702,11 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
         'Fotos': '', 'Ações': 0, 'Fiscal Nome Completo': '', 'Supervisão Sigla': 'SBXD',
         'Nome Arquivo': filename, 'Fotos Extraídas': 0, 'Regularização': 'NÃO'  # Adicionado campo Regularização
     }
+
+def extrair_todos_dados(texto, filename, pdf_path, temp_dir, tempos=None, decoracoes=None):
+    """Extrai todos os dados del PDF de forma estruturada (tempos opcional recebe a duração de cada etapa)"""
+    inicio = time.perf_counter()
+    dados = dados_vazios(filename)
     
     # Extrai metadados básicos
     campos_meta = [
@@ -444,6 +735,7 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
     dados['Fiscal'] = formatar_agente_fiscalizacao(dados['Fiscal'])
     dados['Supervisão'] = formatar_responsavel(dados['Supervisão'])
     dados['Data'] = formatar_data_relatorio(dados['Data'])
+    inicio = registrar_etapa(tempos, 'metadados', inicio)
     
     # Extração das seções - abordagem mais robusta
     secoes = [
@@ -459,7 +751,8 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
     for secao_nome, campo_dados in secoes:
         secao_conteudo = extrair_secao(texto, secao_nome)
         if secao_conteudo:
-            if campo_dados:
+            # A seção 05 é limpa abaixo, após remover a "Fonte Informação"
+            if campo_dados and secao_nome != "05 - Documentos Solicitados / Expedidos":
                 dados[campo_dados] = clean_text(secao_conteudo)
             
             # Processamentos específicos
@@ -505,6 +798,8 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
                 # Extrai a data del relatório anterior
                 dados['Outras Informações - Data Relatório Anterior'] = extrair_data_relatorio_anterior(secao_conteudo)
     
+    inicio = registrar_etapa(tempos, 'secoes', inicio)
+    
     # Determina a regularização (SIM/NÃO)
     try:
         data_art = dados['Data ART']
@@ -521,13 +816,14 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
     except:
         # Em caso de erro no parsing das datas, mantém o valor padrão 'NÃO'
         pass
+    inicio = registrar_etapa(tempos, 'regularizacao', inicio)
     
     # Seção 08 - Fotos - Abordagem mais robusta
     tem_secao_fotos = melhorar_deteccao_secao_fotos(texto)
     
     if tem_secao_fotos:
         # Extrai TODAS as fotos del PDF
-        fotos_extraidas = extrair_todas_fotos_pdf(pdf_path, temp_dir, filename)
+        fotos_extraidas = extrair_todas_fotos_pdf(pdf_path, temp_dir, filename, decoracoes)
         dados['Fotos Extraídas'] = len(fotos_extraidas)
         
         if fotos_extraidas:
@@ -536,27 +832,197 @@ def extrair_todos_dados(texto, filename, pdf_path, temp_dir):
             dados['Fotos'] = "Seção de fotos encontrada, mas nenhuma imagem extraída"
     else:
         # Mesmo sem seção explícita, tenta extrair fotos
-        fotos_extraidas = extrair_todas_fotos_pdf(pdf_path, temp_dir, filename)
+        fotos_extraidas = extrair_todas_fotos_pdf(pdf_path, temp_dir, filename, decoracoes)
         dados['Fotos Extraídas'] = len(fotos_extraidas)
         
         if fotos_extraidas:
             dados['Fotos'] = f"{len(fotos_extraidas)} foto(s) extraída(s) (sem seção explícita)"
         else:
             dados['Fotos'] = "Nenhuma seção de fotos encontrada e nenhuma imagem extraída"
+    registrar_etapa(tempos, 'fotos', inicio)
     
     return dados
 
+# =================== VALIDAÇÃO (CORPUS DE REFERÊNCIA) ===================
+ARQUIVO_ESPERADO = "esperado.json"
+
+def caminho_tempos_corpus(diretorio):
+    """Arquivo com os tempos da última validação de um corpus (fora do corpus, no cache, por caminho)"""
+    chave = hashlib.sha256(os.path.realpath(diretorio).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(DIRETORIO_CACHE, "validacao", f"tempos_{chave}.json")
+
+def extrair_pdf_referencia(pdf_path):
+    """Extrai os dados de um PDF do corpus de referência medindo o tempo de cada etapa"""
+    tempos = {}
+    temp_dir = criar_temp_dir()
+    try:
+        inicio = time.perf_counter()
+        textos = extrair_textos_paginas(pdf_path)
+        registrar_etapa(tempos, 'texto', inicio)
+        dados = extrair_todos_dados("\n".join(textos), os.path.basename(pdf_path), pdf_path, temp_dir, tempos)
+    finally:
+        limpar_temp_dir(temp_dir)
+    return dados, tempos
+
+def ler_json(caminho, padrao):
+    """Lê um arquivo JSON, retornando padrao se ele não existir"""
+    if not os.path.exists(caminho):
+        return padrao
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def gravar_json(caminho, conteudo, sort_keys=True):
+    """Grava conteudo em um arquivo JSON legível (sort_keys=False preserva a ordem das chaves)"""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False, indent=2, sort_keys=sort_keys)
+
+def comparar_com_esperado(resultados, esperado):
+    """Compara campo a campo os dados extraídos com os valores esperados.
+    
+    Retorna uma lista de tuplas (arquivo, campo, esperado, obtido).
+    """
+    diferencas = []
+    for arquivo in sorted(set(resultados) | set(esperado)):
+        if arquivo not in esperado:
+            diferencas.append((arquivo, '*', 'sem valores esperados', 'novo arquivo'))
+            continue
+        if arquivo not in resultados:
+            diferencas.append((arquivo, '*', 'arquivo de referência', 'ausente no corpus'))
+            continue
+        obtido = resultados[arquivo]
+        for campo in sorted(set(obtido) | set(esperado[arquivo])):
+            valor_esperado = esperado[arquivo].get(campo, '')
+            valor_obtido = obtido.get(campo, '')
+            if valor_esperado != valor_obtido:
+                diferencas.append((arquivo, campo, valor_esperado, valor_obtido))
+    return diferencas
+
+def validar_corpus(diretorio, atualizar=False, processos=None):
+    """Executa a extração em paralelo sobre o corpus de referência e compara com os valores esperados.
+    
+    Imprime as diferenças por campo e a variação do tempo de cada etapa em relação à execução anterior.
+    Retorna 0 se não houver diferenças (ou se os valores esperados foram atualizados) e 1 caso contrário.
+    """
+    pdfs = sorted(f for f in os.listdir(diretorio) if f.lower().endswith('.pdf'))
+    if not pdfs:
+        print(f"Nenhum PDF encontrado em {diretorio}")
+        return 1
+    
+    with ProcessPoolExecutor(max_workers=processos, initializer=silenciar_avisos_streamlit) as pool:
+        execucoes = list(pool.map(extrair_pdf_referencia, [os.path.join(diretorio, f) for f in pdfs]))
+    
+    resultados = {arquivo: dados for arquivo, (dados, _) in zip(pdfs, execucoes)}
+    tempos_atuais = {}
+    for _, tempos in execucoes:
+        for etapa, duracao in tempos.items():
+            tempos_atuais[etapa] = tempos_atuais.get(etapa, 0.0) + duracao
+    
+    # Tempos por etapa comparados com a execução anterior
+    caminho_tempos = caminho_tempos_corpus(diretorio)
+    tempos_anteriores = ler_json(caminho_tempos, {})
+    print(f"Tempos por etapa ({len(pdfs)} PDFs):")
+    for etapa, duracao in tempos_atuais.items():
+        anterior = tempos_anteriores.get(etapa)
+        if anterior:
+            variacao = (duracao - anterior) / anterior * 100
+            print(f"  {etapa:<15} {duracao:8.3f}s  (anterior {anterior:.3f}s, {variacao:+.1f}%)")
+        else:
+            print(f"  {etapa:<15} {duracao:8.3f}s")
+    os.makedirs(os.path.dirname(caminho_tempos), exist_ok=True)
+    gravar_json(caminho_tempos, tempos_atuais)
+    
+    caminho_esperado = os.path.join(diretorio, ARQUIVO_ESPERADO)
+    if atualizar:
+        gravar_json(caminho_esperado, resultados)
+        print(f"Valores esperados atualizados em {caminho_esperado}")
+        return 0
+    
+    diferencas = comparar_com_esperado(resultados, ler_json(caminho_esperado, {}))
+    if not diferencas:
+        print("Nenhuma diferença em relação aos valores esperados.")
+        return 0
+    
+    print(f"{len(diferencas)} diferença(s) encontrada(s):")
+    for arquivo, campo, valor_esperado, valor_obtido in diferencas:
+        print(f"  {arquivo} | {campo}: esperado {valor_esperado!r}, obtido {valor_obtido!r}")
+    return 1
+
+def main_cli(argv):
+    """Interface de linha de comando para a validação do corpus de referência"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Valida a extração dos RFs contra um corpus de PDFs de referência")
+    parser.add_argument('--validar-corpus', metavar='DIRETORIO', required=True,
+                        help=f"diretório com os PDFs de referência e o arquivo {ARQUIVO_ESPERADO}")
+    parser.add_argument('--atualizar', action='store_true',
+                        help="grava os resultados atuais como novos valores esperados")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos paralelos (padrão: número de CPUs)")
+    args = parser.parse_args(argv)
+    return validar_corpus(args.validar_corpus, args.atualizar, args.processos)
+
 # =================== GERADORES DE RELATÓRIO ===================
-def gerar_relatorio_completo(df):
-    """Gera PDF com todos os dados extraídos"""
+def linha_relatorio(row):
+    """Calcula as células da tabela resumida do relatório e as contribuições de um RF para os totais"""
+    pd = importar_modulo('pandas')
+    
+    # RF
+    rf_text = str(row['RF'])[:15] + '...' if len(str(row['RF'])) > 15 else str(row['RF'])
+    
+    # RF Principal
+    rf_principal_text = str(row['RF Principal'])[:15] + '...' if len(str(row['RF Principal'])) > 15 else str(row['RF Principal'])
+    
+    # Data ART - Exibe a data no formato DD/MM/AAAA
+    data_art_text = str(row['Data ART'])[:10] if row['Data ART'] and str(row['Data ART']).strip() != '' else ''
+    
+    # Regularização
+    regularizacao = str(row['Regularização']) if 'Regularização' in row else 'NÃO'
+    
+    # Protocolos: 1 se tiver protocolo, 0 se não tiver
+    tem_protocolo = '1' if row['Protocolo'] and str(row['Protocolo']).strip() != '' else '0'
+    
+    # Autuações - Usa a contagem de AUTUACAO da seção 04
+    autuacoes = row['_Autuações_Count'] if '_Autuações_Count' in row else ''
+    if pd.notna(autuacoes) and autuacoes != '':
+        autuacoes_count = int(autuacoes)
+    else:
+        autuacoes_count = 1 if row['Autuação'] and str(row['Autuação']).strip() != '' else 0
+    
+    # Fotos - SIM se tem fotos extraídas, NÃO se não tem
+    tem_fotos = 'SIM' if row['Fotos Extraídas'] > 0 else 'NÃO'
+    
+    celulas = [
+        rf_text, rf_principal_text, data_art_text, regularizacao, str(row['Data']),
+        str(row['Ações']),            # Ações (quantidade de "Ramo Atividade :" na seção 04)
+        str(row['Ofício']),           # Ofícios (0 ou 1)
+        str(row['Resposta Ofício']),  # Resposta Ofícios (0 ou 1)
+        tem_protocolo, str(autuacoes_count), tem_fotos
+    ]
+    totais = {
+        'acoes': int(row['Ações']) if pd.notna(row['Ações']) else 0,
+        'oficios': int(row['Ofício']) if pd.notna(row['Ofício']) else 0,
+        'resposta_oficios': int(row['Resposta Ofício']) if pd.notna(row['Resposta Ofício']) else 0,
+        'protocolos': 1 if tem_protocolo == '1' else 0,
+        'autuacoes': autuacoes_count,
+        'fotos': 1 if tem_fotos == 'SIM' else 0,
+        'legalizacoes': 1 if regularizacao == 'SIM' else 0
+    }
+    return {'celulas': celulas, 'totais': totais}
+
+def gerar_relatorio_completo(df, linhas=None, data_fixa=None):
+    """Gera PDF com todos os dados extraídos (linhas opcional: linhas da tabela já calculadas por linha_relatorio).
+    
+    Com data_fixa, a saída é reprodutível: a linha "Gerado em" é omitida (o período dos RFs já situa
+    o relatório) e data_fixa é gravada como data de criação do PDF.
+    """
+    pd = importar_modulo('pandas')
+    FPDF = importar_modulo('fpdf').FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
     
     try:
-        logo_path = "10.png"
-        if os.path.exists(logo_path):
-            pdf.image(logo_path, x=50, y=10, w=110)
+        if logo_disponivel():
+            pdf.image(LOGO_PATH, x=50, y=10, w=110)
             pdf.ln(40)
     except:
         pass
@@ -577,7 +1043,8 @@ def gerar_relatorio_completo(df):
             ultima_data = datas_validas.max().strftime('%d/%m/%Y')
             pdf.cell(0, 10, f'Período: {primeira_data} a {ultima_data}', 0, 1)
     
-    pdf.cell(0, 10, f'Gerado em: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}', 0, 1)
+    if data_fixa is None:
+        pdf.cell(0, 10, f'Gerado em: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}', 0, 1)
     pdf.ln(10)
     
     # Configuração de colunas resumidas
@@ -595,91 +1062,35 @@ def gerar_relatorio_completo(df):
     df_validos = df[df['RF'] != 'TOTAL'] if 'TOTAL' in df['RF'].values else df
     num_registros = len(df_validos)
     
+    if linhas is None:
+        linhas = [linha_relatorio(row) for _, row in df_validos.iterrows()]
+    
     # Variáveis para calcular totais
-    total_acoes = 0
-    total_oficios = 0
-    total_resposta_oficios = 0
-    total_protocolos = 0
-    total_autuacoes = 0
-    total_fotos = 0
-    total_legalizacoes = 0
+    totais = {'acoes': 0, 'oficios': 0, 'resposta_oficios': 0, 'protocolos': 0,
+              'autuacoes': 0, 'fotos': 0, 'legalizacoes': 0}
     
-    for _, row in df_validos.iterrows():
-        # RF
-        rf_text = str(row['RF'])[:15] + '...' if len(str(row['RF'])) > 15 else str(row['RF'])
-        pdf.cell(col_widths[0], 8, rf_text, 1, 0, 'C')
-        
-        # RF Principal
-        rf_principal_text = str(row['RF Principal'])[:15] + '...' if len(str(row['RF Principal'])) > 15 else str(row['RF Principal'])
-        pdf.cell(col_widths[1], 8, rf_principal_text, 1, 0, 'C')
-        
-        # Data ART - Exibe a data no formato DD/MM/AAAA
-        data_art_text = str(row['Data ART'])[:10] if row['Data ART'] and str(row['Data ART']).strip() != '' else ''
-        pdf.cell(col_widths[2], 8, data_art_text, 1, 0, 'C')
-        
-        # Regularização
-        regularizacao = str(row['Regularização']) if 'Regularização' in row else 'NÃO'
-        pdf.cell(col_widths[3], 8, regularizacao, 1, 0, 'C')
-        
-        # Data
-        pdf.cell(col_widths[4], 8, str(row['Data']), 1, 0, 'C')
-        
-        # Ações (AGORA: quantidade de "Ramo Atividade :" na seção 04)
-        pdf.cell(col_widths[5], 8, str(row['Ações']), 1, 0, 'C')
-        
-        # Ofícios (usa a coluna Ofício que agora é 0 ou 1)
-        pdf.cell(col_widths[6], 8, str(row['Ofício']), 1, 0, 'C')
-        
-        # Resposta Ofícios (usa a coluna Resposta Ofício que agora é 0 ou 1)
-        pdf.cell(col_widths[7], 8, str(row['Resposta Ofício']), 1, 0, 'C')
-        
-        # Protocolos: 1 se tiver protocolo, 0 se não tiver
-        tem_protocolo = '1' if row['Protocolo'] and str(row['Protocolo']).strip() != '' else '0'
-        pdf.cell(col_widths[8], 8, tem_protocolo, 1, 0, 'C')
-        
-        # Autuações - Usa a contagem de AUTUACAO da seção 04
-        if '_Autuações_Count' in row and pd.notna(row['_Autuações_Count']):
-            autuacoes_count = int(row['_Autuações_Count'])
-            pdf.cell(col_widths[9], 8, str(autuacoes_count), 1, 0, 'C')
-        else:
-            tem_autuacao = '1' if row['Autuação'] and str(row['Autuação']).strip() != '' else '0'
-            pdf.cell(col_widths[9], 8, tem_autuacao, 1, 0, 'C')
-            autuacoes_count = 1 if tem_autuacao == '1' else 0
-        
-        # Fotos - SIM se tem fotos extraídas, NÃO se não tem
-        tem_fotos = 'SIM' if row['Fotos Extraídas'] > 0 else 'NÃO'
-        pdf.cell(col_widths[10], 8, tem_fotos, 1, 0, 'C')
-        
+    for linha in linhas:
+        for i, celula in enumerate(linha['celulas']):
+            pdf.cell(col_widths[i], 8, celula, 1, 0, 'C')
         pdf.ln()
         
         # Acumula totais
-        total_acoes += row['Ações'] if pd.notna(row['Ações']) else 0
-        total_oficios += row['Ofício'] if pd.notna(row['Ofício']) else 0
-        total_resposta_oficios += row['Resposta Ofício'] if pd.notna(row['Resposta Ofício']) else 0
-        total_protocolos += 1 if tem_protocolo == '1' else 0
-        
-        # Para autuações, soma a contagem específica se disponível
-        if '_Autuações_Count' in row and pd.notna(row['_Autuações_Count']):
-            total_autuacoes += int(row['_Autuações_Count'])
-        else:
-            total_autuacoes += 1 if tem_autuacao == '1' else 0
-            
-        total_fotos += 1 if tem_fotos == 'SIM' else 0
-        total_legalizacoes += 1 if regularizacao == 'SIM' else 0
+        for chave, valor in linha['totais'].items():
+            totais[chave] += valor
     
     # Linha de totais
     pdf.set_font('Arial', 'B', 7)
     pdf.cell(col_widths[0], 8, f"TOTAL ({num_registros})", 1, 0, 'C')
     pdf.cell(col_widths[1], 8, "", 1, 0, 'C')  # RF Principal
     pdf.cell(col_widths[2], 8, "", 1, 0, 'C')  # Data ART
-    pdf.cell(col_widths[3], 8, str(total_legalizacoes), 1, 0, 'C')  # Regularização
+    pdf.cell(col_widths[3], 8, str(totais['legalizacoes']), 1, 0, 'C')  # Regularização
     pdf.cell(col_widths[4], 8, "", 1, 0, 'C')  # Data
-    pdf.cell(col_widths[5], 8, str(total_acoes), 1, 0, 'C')  # Total Ações
-    pdf.cell(col_widths[6], 8, str(total_oficios), 1, 0, 'C')  # Total Ofícios
-    pdf.cell(col_widths[7], 8, str(total_resposta_oficios), 1, 0, 'C')  # Total Resposta Ofícios
-    pdf.cell(col_widths[8], 8, str(total_protocolos), 1, 0, 'C')  # Total Protocolos
-    pdf.cell(col_widths[9], 8, str(total_autuacoes), 1, 0, 'C')  # Total Autuações
-    pdf.cell(col_widths[10], 8, str(total_fotos), 1, 0, 'C')  # Total Fotos
+    pdf.cell(col_widths[5], 8, str(totais['acoes']), 1, 0, 'C')  # Total Ações
+    pdf.cell(col_widths[6], 8, str(totais['oficios']), 1, 0, 'C')  # Total Ofícios
+    pdf.cell(col_widths[7], 8, str(totais['resposta_oficios']), 1, 0, 'C')  # Total Resposta Ofícios
+    pdf.cell(col_widths[8], 8, str(totais['protocolos']), 1, 0, 'C')  # Total Protocolos
+    pdf.cell(col_widths[9], 8, str(totais['autuacoes']), 1, 0, 'C')  # Total Autuações
+    pdf.cell(col_widths[10], 8, str(totais['fotos']), 1, 0, 'C')  # Total Fotos
     pdf.ln()
     
     # Adiciona as informações complementares após a tabela
@@ -717,9 +1128,501 @@ def gerar_relatorio_completo(df):
         pdf.set_font('Arial', '', 12)
         pdf.cell(0, 10, 'Nenhuma informação complementar disponível.', 0, 1, 'C')
     
-    return pdf.output(dest='S').encode('latin1')
+    conteudo = pdf.output(dest='S').encode('latin1')
+    if data_fixa is not None:
+        # O FPDF grava a data atual em /CreationDate; a substituição mantém o tamanho e os offsets do xref
+        conteudo = re.sub(rb'/CreationDate \(D:\d{14}\)',
+                          f"/CreationDate (D:{data_fixa.strftime('%Y%m%d%H%M%S')})".encode('latin1'), conteudo)
+    return conteudo
+
+def normalizar_zip(conteudo, data_fixa):
+    """Regrava um arquivo ZIP (ex.: xlsx) com datas fixas nas entradas e nas propriedades do documento"""
+    zipfile = importar_modulo('zipfile')
+    data_iso = data_fixa.strftime('%Y-%m-%dT%H:%M:%SZ').encode('ascii')
+    saida = BytesIO()
+    with zipfile.ZipFile(BytesIO(conteudo)) as origem, zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for info in origem.infolist():
+            dados = origem.read(info.filename)
+            if info.filename == 'docProps/core.xml':
+                dados = re.sub(rb'(<dcterms:(created|modified)[^>]*>)[^<]*(</dcterms:\2>)',
+                               lambda m: m.group(1) + data_iso + m.group(3), dados)
+            destino.writestr(zipfile.ZipInfo(info.filename, date_time=data_fixa.timetuple()[:6]), dados,
+                             compress_type=zipfile.ZIP_DEFLATED)
+    return saida.getvalue()
+
+def gerar_excel(df_completo, data_fixa=None):
+    """Gera a planilha Excel com as abas 'Dados Completos' e 'Resumo' (data_fixa: saída reprodutível)"""
+    pd = importar_modulo('pandas')
+    excel_buffer = BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+        df_completo.to_excel(writer, sheet_name='Dados Completos', index=False)
+        
+        colunas_resumo = ['RF', 'RF Principal', 'Fiscal', 'Supervisão', 'Data', 'Data ART', 'Regularização', 'Fato Gerador', 'Protocolo', 
+                         'Identificação dos Contratados/Responsáveis', 'Autuação', 'Ações', 'Ofício', 'Resposta Ofício', 'Fotos']
+        df_resumo = df_completo[[col for col in colunas_resumo if col in df_completo.columns]]
+        df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
+    
+    if data_fixa:
+        return normalizar_zip(excel_buffer.getvalue(), data_fixa)
+    return excel_buffer.getvalue()
+
+# =================== INGESTÃO EM LOTES ===================
+def nome_relativo(caminho):
+    """Nome de um PDF pelo caminho relativo à raiz do ZIP/pasta (com "/"), sem componentes vazios ou ".."
+
+    Evita colisões entre arquivos homônimos em subpastas diferentes (ex.: jan/RF.pdf e fev/RF.pdf),
+    inclusive nas subpastas de fotos, que seguem o mesmo nome.
+    """
+    partes = [parte for parte in caminho.replace('\\', '/').split('/') if parte not in ('', '.', '..')]
+    return '/'.join(partes)
+
+def resolver_pasta_servidor(pasta):
+    """Caminho real de uma pasta do servidor, ou None se estiver fora de PASTA_RAIZ_SERVIDOR"""
+    raiz = os.path.realpath(PASTA_RAIZ_SERVIDOR)
+    caminho = os.path.realpath(os.path.join(raiz, pasta))
+    if os.path.commonpath([raiz, caminho]) != raiz:
+        return None
+    return caminho
+
+def iterar_pdfs_upload(arquivos, temp_dir):
+    """Grava em disco, um a um, os PDFs enviados pelo navegador"""
+    for file in arquivos:
+        temp_path = os.path.join(temp_dir, file.name)
+        with open(temp_path, "wb") as f:
+            f.write(file.getbuffer())
+        yield file.name, temp_path, True
+
+def iterar_pdfs_zip(arquivo_zip, temp_dir):
+    """Descompacta, um a um e sob demanda, os PDFs contidos em um arquivo ZIP"""
+    zipfile = importar_modulo('zipfile')
+    with zipfile.ZipFile(arquivo_zip) as zf:
+        for num, info in enumerate(zf.infolist()):
+            if info.is_dir() or not info.filename.lower().endswith('.pdf'):
+                continue
+            nome = nome_relativo(info.filename)
+            # Nome temporário único: o nome original pode se repetir em subpastas do ZIP
+            temp_path = os.path.join(temp_dir, f"zip_{num}.pdf")
+            with zf.open(info) as origem, open(temp_path, "wb") as destino:
+                shutil.copyfileobj(origem, destino)
+            yield nome, temp_path, True
+
+def iterar_pdfs_pasta(pasta):
+    """Percorre os PDFs de uma pasta do servidor (os arquivos são lidos no local, sem cópia)"""
+    for raiz, diretorios, arquivos in os.walk(pasta):
+        diretorios.sort()
+        for nome in sorted(arquivos):
+            if nome.lower().endswith('.pdf'):
+                caminho = os.path.join(raiz, nome)
+                yield nome_relativo(os.path.relpath(caminho, pasta)), caminho, False
+
+def em_lotes(iteravel, tamanho):
+    """Agrupa os itens de um iterável em listas de no máximo tamanho itens"""
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# =================== RESULTADOS PARCIAIS POR ARQUIVO ===================
+def chave_parcial(filename, hash_pdf, com_ocr, impressao_decoracoes):
+    """Chave do resultado parcial de um PDF: conteúdo, nome, aplicação de OCR, decorações conhecidas
+    (IndiceDecoracoes.impressao) e versão da extração.
+    
+    com_ocr indica se o OCR foi aplicado às páginas sem texto: é falso para PDFs com texto em
+    todas as páginas, cujo resultado não depende da opção de OCR.
+    """
+    base = f"{VERSAO_EXTRACAO}|{int(bool(com_ocr))}|{impressao_decoracoes}|{filename}|{hash_pdf}"
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+def buscar_parcial(filename, hash_pdf, usar_ocr, impressao_decoracoes):
+    """Procura em cache o resultado de um PDF válido para a opção de OCR escolhida.
+    
+    Com OCR, vale o resultado com OCR (só existe para PDFs digitalizados) ou, na falta dele, o
+    resultado sem OCR de um PDF sem páginas digitalizadas. Retorna (chave, parcial) ou (None, None).
+    """
+    for com_ocr in ([True, False] if usar_ocr else [False]):
+        chave = chave_parcial(filename, hash_pdf, com_ocr, impressao_decoracoes)
+        parcial = ler_parcial(chave)
+        if parcial is not None and not (usar_ocr and not com_ocr and parcial.get('paginas_digitalizadas')):
+            return chave, parcial
+    return None, None
+
+def diretorio_parcial(chave):
+    """Diretório em cache com o resultado parcial (dados e fotos) de um PDF"""
+    return os.path.join(DIRETORIO_CACHE, "parciais", chave)
+
+def ler_parcial(chave):
+    """Lê o resultado parcial em cache de um PDF (None se ainda não processado)"""
+    parcial = ler_json(os.path.join(diretorio_parcial(chave), "parcial.json"), None)
+    if parcial is not None:
+        # Marca o uso, adiando a expiração (ver expirar_cache)
+        os.utime(diretorio_parcial(chave))
+    return parcial
+
+def ler_texto_parcial(chave):
+    """Lê o texto completo de um PDF guardado com o resultado parcial (vazio se indisponível)"""
+    caminho = os.path.join(diretorio_parcial(chave), "texto.txt")
+    if not os.path.exists(caminho):
+        return ''
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def gravar_parcial(chave, dados, paginas_digitalizadas=0, texto='', armazenar=True):
+    """Grava o resultado parcial de um PDF: linha de dados, linha do relatório, fotos extraídas,
+    quantidade de páginas digitalizadas sem OCR (para repetir o aviso quando lido do cache) e,
+    à parte em texto.txt, o texto completo (para reindexar a busca textual).
+    
+    Com armazenar=False (ex.: falha no OCR), o resultado é montado sem gravar parcial.json,
+    de modo que o PDF é processado novamente na próxima execução."""
+    os.makedirs(diretorio_parcial(chave), exist_ok=True)
+    with open(os.path.join(diretorio_parcial(chave), "texto.txt"), 'w', encoding='utf-8') as f:
+        f.write(texto)
+    
+    fotos_dir = os.path.join(diretorio_parcial(chave), "fotos")
+    fotos = []
+    for root, _, files in os.walk(fotos_dir):
+        for file in sorted(files):
+            fotos.append(os.path.relpath(os.path.join(root, file), fotos_dir))
+    
+    parcial = {'chave': chave, 'dados': dados, 'linha_relatorio': linha_relatorio(dados), 'fotos': fotos,
+               'paginas_digitalizadas': paginas_digitalizadas}
+    
+    if not armazenar:
+        return parcial
+    
+    # parcial.json é gravado por último e de forma atômica: sua presença indica um resultado completo.
+    # A ordem das chaves de dados é preservada (é a ordem das colunas da planilha)
+    caminho = os.path.join(diretorio_parcial(chave), "parcial.json")
+    gravar_json(caminho + ".tmp", parcial, sort_keys=False)
+    os.replace(caminho + ".tmp", caminho)
+    return parcial
+
+@st.cache_resource(ttl=86400)
+def expirar_cache():
+    """Remove os resultados parciais e os artefatos em cache sem uso há mais de DIAS_RETENCAO_CACHE dias.
+    
+    O ttl limita a varredura a uma vez por dia, repetida enquanto o servidor estiver no ar.
+    Retorna a quantidade de entradas removidas.
+    """
+    limite = time.time() - DIAS_RETENCAO_CACHE * 86400
+    removidas = 0
+    for subdiretorio in ("parciais", "artefatos"):
+        base = os.path.join(DIRETORIO_CACHE, subdiretorio)
+        if not os.path.isdir(base):
+            continue
+        for nome in os.listdir(base):
+            caminho = os.path.join(base, nome)
+            if os.path.getmtime(caminho) < limite:
+                shutil.rmtree(caminho, ignore_errors=True)
+                removidas += 1
+    return removidas
+
+# =================== ÍNDICE DE BUSCA (FTS5) ===================
+# Colunas pesquisáveis do índice: (coluna, rótulo na interface, campo de extrair_todos_dados)
+CAMPOS_INDICE = [
+    ('rf', 'RF', 'RF'),
+    ('contratante', 'Identificação do Contratante', 'Identificação do Contratante'),
+    ('atividade', 'Atividade Desenvolvida', 'Atividade Desenvolvida'),
+    ('contratados', 'Contratados/Responsáveis', 'Identificação dos Contratados/Responsáveis'),
+    ('documentos_solicitados', 'Documentos Solicitados/Expedidos', 'Documentos Solicitados/Expedidos'),
+    ('documentos_recebidos', 'Documentos Recebidos', 'Documentos Recebidos'),
+    ('informacoes_complementares', 'Informações Complementares', 'Outras Informações - Informações Complementares'),
+    ('texto', 'Texto completo do RF', None),
+]
+
+def conectar_indice():
+    """Abre o índice de busca, criando as tabelas na primeira utilização"""
+    os.makedirs(os.path.dirname(ARQUIVO_INDICE), exist_ok=True)
+    con = sqlite3.connect(ARQUIVO_INDICE)
+    colunas = [coluna for coluna, _, _ in CAMPOS_INDICE]
+    novos = ', '.join(f'new.{coluna}' for coluna in colunas)
+    antigos = ', '.join(f'old.{coluna}' for coluna in colunas)
+    con.executescript(f"""
+        CREATE TABLE IF NOT EXISTS documentos (
+            id INTEGER PRIMARY KEY,
+            chave TEXT UNIQUE NOT NULL,
+            arquivo TEXT, data TEXT, fiscal TEXT, indexado_em TEXT,
+            {', '.join(f'{coluna} TEXT' for coluna in colunas)}
+        );
+        CREATE INDEX IF NOT EXISTS documentos_arquivo_rf ON documentos (arquivo, rf);
+        CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(
+            {', '.join(colunas)},
+            content='documentos', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS documentos_ai AFTER INSERT ON documentos BEGIN
+            INSERT INTO documentos_fts (rowid, {', '.join(colunas)}) VALUES (new.id, {novos});
+        END;
+        CREATE TRIGGER IF NOT EXISTS documentos_ad AFTER DELETE ON documentos BEGIN
+            INSERT INTO documentos_fts (documentos_fts, rowid, {', '.join(colunas)}) VALUES ('delete', old.id, {antigos});
+        END;
+    """)
+    return con
+
+def rf_indexado(indice, chave):
+    """Indica se o resultado parcial de chave já está no índice"""
+    return indice.execute("SELECT 1 FROM documentos WHERE chave = ?", (chave,)).fetchone() is not None
+
+def indexar_rf(indice, chave, dados, texto=''):
+    """Inclui no índice as seções de um RF (ignorado se a chave já estiver indexada).
+    
+    Versões anteriores do mesmo arquivo/RF (outra chave) são substituídas.
+    """
+    if rf_indexado(indice, chave):
+        return
+    indice.execute("DELETE FROM documentos WHERE arquivo = ? AND rf = ?", (dados['Nome Arquivo'], dados['RF']))
+    colunas = [coluna for coluna, _, _ in CAMPOS_INDICE]
+    valores = [texto if campo is None else str(dados.get(campo, '')) for _, _, campo in CAMPOS_INDICE]
+    indice.execute(
+        f"INSERT INTO documentos (chave, arquivo, data, fiscal, indexado_em, {', '.join(colunas)}) "
+        f"VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(colunas))})",
+        [chave, dados['Nome Arquivo'], dados['Data'], dados['Fiscal'], datetime.now().isoformat(timespec='seconds')] + valores
+    )
+
+def montar_consulta_fts(consulta):
+    """Converte a consulta digitada em uma expressão FTS5 segura.
+    
+    Cada termo ou "frase entre aspas" vira uma frase FTS5; termos terminados em * buscam por prefixo.
+    """
+    partes = []
+    for frase, termo in re.findall(r'"([^"]+)"|(\S+)', consulta):
+        valor = frase or termo
+        prefixo = valor.endswith('*') and not frase
+        valor = valor.rstrip('*') if prefixo else valor
+        if valor:
+            partes.append('"' + valor.replace('"', '""') + '"' + ('*' if prefixo else ''))
+    return ' '.join(partes)
+
+def buscar_rfs(consulta, coluna=None, limite=200):
+    """Busca no índice os RFs que atendem à consulta, opcionalmente restrita a uma coluna"""
+    expressao = montar_consulta_fts(consulta)
+    if not expressao or not os.path.exists(ARQUIVO_INDICE):
+        return []
+    if coluna:
+        expressao = f"{coluna} : ({expressao})"
+    indice = conectar_indice()
+    try:
+        return indice.execute("""
+            SELECT d.rf, d.data, d.fiscal, d.arquivo, snippet(documentos_fts, -1, '[', ']', '…', 16)
+            FROM documentos_fts JOIN documentos d ON d.id = documentos_fts.rowid
+            WHERE documentos_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """, (expressao, limite)).fetchall()
+    finally:
+        indice.close()
+
+@st.fragment
+def busca_rfs_processados():
+    """Interface de busca textual nas seções de todos os RFs já processados.
+    
+    Executada como fragmento: cada nova consulta reexecuta apenas a busca, não a extração.
+    """
+    with st.expander("🔎 Buscar nos RFs processados", expanded=False):
+        rotulos = ['Todos os campos'] + [rotulo for _, rotulo, _ in CAMPOS_INDICE]
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            rotulo = st.selectbox("Campo", rotulos)
+        with col2:
+            consulta = st.text_input("Buscar por empresa, CNPJ ou trecho (use aspas para frases e * para prefixos)")
+        
+        if consulta:
+            coluna = next((coluna for coluna, r, _ in CAMPOS_INDICE if r == rotulo), None)
+            inicio = time.perf_counter()
+            try:
+                resultados = buscar_rfs(consulta, coluna)
+            except sqlite3.Error as e:
+                st.error(f"❌ Erro na busca: {str(e)}")
+                return
+            tempo_ms = (time.perf_counter() - inicio) * 1000
+            st.caption(f"{len(resultados)} resultado(s), consulta ao índice em {tempo_ms:.1f} ms")
+            if resultados:
+                pd = importar_modulo('pandas')
+                st.dataframe(pd.DataFrame(resultados, columns=['RF', 'Data', 'Fiscal', 'Arquivo', 'Trecho']),
+                             hide_index=True)
+
+# =================== BUFFER COLUNAR ===================
+class BufferColunar:
+    """Acumula os dados dos RFs por coluna em tabelas Arrow, em vez de uma lista de dicionários.
+    
+    As linhas de cada lote ficam em listas por coluna até fechar_lote(), quando são convertidas
+    para Arrow: colunas de COLUNAS_CATEGORICAS são codificadas como dicionário e as de
+    COLUNAS_INTEIRAS armazenadas como int32.
+    """
+    
+    def __init__(self):
+        self.tabelas = []
+        self.colunas = {}
+        self.num_linhas = 0
+    
+    def adicionar(self, dados):
+        """Acrescenta a linha de um RF ao lote corrente"""
+        for campo in dados:
+            if campo not in self.colunas:
+                self.colunas[campo] = [None] * self.num_linhas
+        for campo, valores in self.colunas.items():
+            valores.append(dados.get(campo))
+        self.num_linhas += 1
+    
+    def fechar_lote(self):
+        """Converte as linhas do lote corrente para uma tabela Arrow compacta"""
+        if not self.num_linhas:
+            return
+        pa = importar_modulo('pyarrow')
+        arrays = {}
+        for campo, valores in self.colunas.items():
+            if campo in COLUNAS_INTEIRAS:
+                arrays[campo] = pa.array(valores, type=pa.int32())
+            elif campo in COLUNAS_CATEGORICAS:
+                arrays[campo] = pa.array(['' if v is None else str(v) for v in valores], type=pa.string()).dictionary_encode()
+            else:
+                arrays[campo] = pa.array(['' if v is None else str(v) for v in valores], type=pa.string())
+        self.tabelas.append(pa.table(arrays))
+        self.colunas = {}
+        self.num_linhas = 0
+    
+    def para_dataframe(self):
+        """Monta o DataFrame final (colunas categóricas e inteiras) a partir dos lotes fechados"""
+        pa = importar_modulo('pyarrow')
+        pd = importar_modulo('pandas')
+        self.fechar_lote()
+        tabela = pa.concat_tables(self.tabelas, promote_options='default').unify_dictionaries()
+        # Inteiros anuláveis: uma coluna ausente em parte dos RFs (ex.: _Autuações_Count) continua
+        # inteira, com valores ausentes, em vez de ser convertida para float com NaN
+        return tabela.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
 
 # =================== MÓDULO PRINCIPAL ===================
+def processar_pdf(textos, filename, pdf_path, chave, indice, decoracoes, temporario=True, paginas_digitalizadas=0,
+                  armazenar=True):
+    """Extrai os dados de um PDF já lido, grava o resultado parcial em cache, indexa as seções e remove o arquivo temporário.
+    
+    Com armazenar=False, o resultado não é guardado em cache nem indexado (ver gravar_parcial).
+    """
+    texto = "\n".join(textos)
+    if not texto.strip():
+        st.warning(f"⚠️ {filename}: nenhum texto extraído, a linha correspondente ficará vazia.")
+    
+    # Descarta restos de uma extração anterior interrompida
+    shutil.rmtree(diretorio_parcial(chave), ignore_errors=True)
+    dados = extrair_todos_dados(texto, filename, pdf_path, diretorio_parcial(chave), decoracoes=decoracoes)
+    decoracoes.registrar_arquivo(filename)
+    parcial = gravar_parcial(chave, dados, paginas_digitalizadas, texto, armazenar)
+    if armazenar:
+        indexar_rf(indice, chave, dados, texto)
+    
+    if temporario:
+        os.unlink(pdf_path)
+    return parcial
+
+def processar_lote(lote, usar_ocr):
+    """Processa um lote de PDFs, retornando os resultados parciais na ordem do lote.
+    
+    PDFs já processados são lidos do cache de resultados parciais. Os digitalizados
+    são enviados ao pool de OCR e concluídos ao final do lote, depois dos PDFs com texto.
+    As decorações aprendidas até o início do lote são ignoradas na extração de fotos.
+    """
+    parciais = [None] * len(lote)
+    pendentes_ocr = []
+    indice = conectar_indice()
+    decoracoes = IndiceDecoracoes()
+    try:
+        for idx, (filename, pdf_path, temporario) in enumerate(lote):
+            hash_pdf = hash_arquivo(pdf_path)
+            chave, parciais[idx] = buscar_parcial(filename, hash_pdf, usar_ocr, decoracoes.impressao)
+            if parciais[idx] is not None:
+                if parciais[idx].get('paginas_digitalizadas'):
+                    st.warning(f"⚠️ {filename}: {parciais[idx]['paginas_digitalizadas']} página(s) sem texto (PDF digitalizado). Ative o OCR para extrair os dados.")
+                # Garante a presença no índice (ex.: se o arquivo do índice foi removido)
+                if not rf_indexado(indice, chave):
+                    indexar_rf(indice, chave, parciais[idx]['dados'], ler_texto_parcial(chave))
+                if temporario:
+                    os.unlink(pdf_path)
+                continue
+            
+            textos = extrair_textos_paginas(pdf_path)
+            
+            # DEBUG: Mostrar texto extraído para análise
+            #with st.expander(f"DEBUG: Texto extraído de {filename}", expanded=False):
+                #st.text("\n".join(textos)[:5000])
+            
+            # O OCR só entra na chave quando há páginas sem texto a que ele seja aplicado
+            chave = chave_parcial(filename, hash_pdf, usar_ocr and bool(paginas_sem_texto(textos)), decoracoes.impressao)
+            paginas_digitalizadas = 0
+            if paginas_sem_texto(textos):
+                if usar_ocr:
+                    hash_pdf, futuros = agendar_ocr(pdf_path, filename, textos)
+                    if futuros:
+                        pendentes_ocr.append((idx, filename, pdf_path, temporario, chave, textos, hash_pdf, futuros))
+                        continue
+                else:
+                    paginas_digitalizadas = len(paginas_sem_texto(textos))
+                    st.warning(f"⚠️ {filename}: {paginas_digitalizadas} página(s) sem texto (PDF digitalizado). Ative o OCR para extrair os dados.")
+            
+            parciais[idx] = processar_pdf(textos, filename, pdf_path, chave, indice, decoracoes, temporario, paginas_digitalizadas)
+        
+        for idx, filename, pdf_path, temporario, chave, textos, hash_pdf, futuros in pendentes_ocr:
+            falhas = concluir_ocr(filename, textos, hash_pdf, futuros)
+            if falhas:
+                st.warning(f"⚠️ {filename}: OCR falhou em {falhas} página(s); o resultado não será guardado em cache e o OCR será repetido na próxima execução.")
+            parciais[idx] = processar_pdf(textos, filename, pdf_path, chave, indice, decoracoes, temporario,
+                                          armazenar=not falhas)
+    finally:
+        # Mesmo se o lote for interrompido, a indexação dos PDFs já processados é mantida
+        indice.commit()
+        indice.close()
+        decoracoes.fechar()
+    return parciais
+
+def entradas_fotos(parciais):
+    """Lista (nome no ZIP, caminho em cache) das fotos de um lote de resultados parciais"""
+    entradas = []
+    for parcial in parciais:
+        fotos_dir = os.path.join(diretorio_parcial(parcial['chave']), "fotos")
+        for arcname in parcial['fotos']:
+            entradas.append((arcname.replace(os.sep, '/'), os.path.join(fotos_dir, arcname)))
+    return entradas
+
+def gravar_fotos_zip(zipf, entradas, data_fixa=None):
+    """Acrescenta fotos ao ZIP de saída; com data_fixa, as entradas são ordenadas e datadas de forma fixa"""
+    zipfile = importar_modulo('zipfile')
+    if data_fixa is None:
+        for arcname, caminho in entradas:
+            zipf.write(caminho, arcname)
+        return
+    for arcname, caminho in sorted(entradas):
+        info = zipfile.ZipInfo(arcname, date_time=data_fixa.timetuple()[:6])
+        info.external_attr = 0o644 << 16
+        with open(caminho, 'rb') as f:
+            zipf.writestr(info, f.read(), compress_type=zipfile.ZIP_DEFLATED)
+
+def ordenar_colunas(colunas):
+    """Ordem estável das colunas: a do modelo de dados_vazios (colunas extras ao final, em ordem alfabética),
+    com "Data ART", "RF Principal" e "Regularização" logo após "Data"."""
+    modelo = list(dados_vazios('')) + ['_Autuações_Count']
+    colunas = [col for col in modelo if col in colunas] + sorted(col for col in colunas if col not in modelo)
+    
+    # Reorganiza as colunas para colocar "Data ART" ao lado de "Data"
+    idx_data = colunas.index('Data')
+    if 'Data ART' in colunas:
+        colunas.insert(idx_data + 1, colunas.pop(colunas.index('Data ART')))
+    if 'RF Principal' in colunas:
+        colunas.insert(idx_data + 2, colunas.pop(colunas.index('RF Principal')))
+    if 'Regularização' in colunas:
+        colunas.insert(idx_data + 3, colunas.pop(colunas.index('Regularização')))
+    return colunas
+
+def chave_artefatos(chaves):
+    """Endereço de conteúdo dos artefatos de um lote: hash do conjunto de resultados parciais de entrada
+    (cujas chaves já incluem as decorações conhecidas na extração)"""
+    base = "|".join([str(VERSAO_EXTRACAO), DATA_FIXA.isoformat()] + sorted(chaves))
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+def diretorio_artefatos(chave):
+    """Diretório em cache com o Excel, o relatório PDF e o ZIP de fotos de um lote"""
+    return os.path.join(DIRETORIO_CACHE, "artefatos", chave)
+
 def extrator_pdf_consolidado():
     st.title("Leitura dos RFs, extração dos dados, geração de planilha excel e produção de Relatórios em PDF.")
     st.markdown("""
@@ -728,49 +1631,84 @@ def extrator_pdf_consolidado():
     - Produz um relatório em PDF com os dados solicitados previamente.
     """)
 
-    uploaded_files = st.file_uploader("Selecione os PDFs para extração", type="pdf", accept_multiple_files=True)
-    
-    if uploaded_files:
+    usar_ocr = st.checkbox("Aplicar OCR (Tesseract) em RFs digitalizados", value=False)
+    origens = ["PDFs", "Arquivo ZIP"] + (["Pasta no servidor"] if PASTA_RAIZ_SERVIDOR else [])
+    origem = st.radio("Origem dos arquivos", origens, horizontal=True)
+    tamanho_lote = st.number_input("PDFs processados por lote", min_value=1, value=TAMANHO_LOTE_PADRAO, step=10)
+    deterministico = st.checkbox("Saída determinística (arquivos reprodutíveis, reaproveitados do cache para o mesmo lote)", value=False)
+    
+    uploaded_files = arquivo_zip = pasta = None
+    if origem == "PDFs":
+        uploaded_files = st.file_uploader("Selecione os PDFs para extração", type="pdf", accept_multiple_files=True)
+    elif origem == "Arquivo ZIP":
+        arquivo_zip = st.file_uploader("Selecione o arquivo ZIP com os PDFs", type="zip")
+        limite = f"Limite de upload: {st.get_option('server.maxUploadSize')} MB (server.maxUploadSize)."
+        if PASTA_RAIZ_SERVIDOR:
+            limite += " Para arquivos maiores, use a opção Pasta no servidor."
+        st.caption(limite)
+    else:
+        pasta = st.text_input(f"Caminho da pasta com os PDFs (relativo a {PASTA_RAIZ_SERVIDOR})")
+        caminho_pasta = resolver_pasta_servidor(pasta) if pasta else None
+        if pasta and caminho_pasta is None:
+            st.error(f"❌ A pasta deve estar dentro de {PASTA_RAIZ_SERVIDOR}: {pasta}")
+        elif pasta and not os.path.isdir(caminho_pasta):
+            st.error(f"❌ Pasta não encontrada: {pasta}")
+            caminho_pasta = None
+        pasta = caminho_pasta
+    
+    if uploaded_files or arquivo_zip or pasta:
+        pd = importar_modulo('pandas')
+        zipfile = importar_modulo('zipfile')
+        if usar_ocr and not ocr_disponivel():
+            st.warning("⚠️ OCR indisponível: instale o Tesseract e o pacote pytesseract. Páginas digitalizadas serão ignoradas.")
+            usar_ocr = False
+        expirar_cache()
         temp_dir = criar_temp_dir()
         try:
             with st.spinner("Processando arquivos..."):
-                dados_completos = []
-                todas_fotos = []
+                if uploaded_files:
+                    pdfs = iterar_pdfs_upload(uploaded_files, temp_dir)
+                elif arquivo_zip:
+                    pdfs = iterar_pdfs_zip(arquivo_zip, temp_dir)
+                else:
+                    pdfs = iterar_pdfs_pasta(pasta)
                 
-                for file in uploaded_files:
-                    temp_path = os.path.join(temp_dir, file.name)
-                    with open(temp_path, "wb") as f:
-                        f.write(file.getbuffer())
-                    
-                    with pdfplumber.open(temp_path) as pdf:
-                        texto = "\n".join(page.extract_text() or "" for page in pdf.pages)
-                    
-                    # DEBUG: Mostrar texto extraído para análise
-                    #with st.expander(f"DEBUG: Texto extraído de {file.name}", expanded=False):
-                        #st.text(texto[:5000] + "..." if len(texto) > 5000 else texto)
-                    
-                    dados = extrair_todos_dados(texto, file.name, temp_path, temp_dir)
-                    dados_completos.append(dados)
-                    
-                    fotos_dir = os.path.join(temp_dir, "fotos", os.path.splitext(file.name)[0])
-                    if os.path.exists(fotos_dir) and os.listdir(fotos_dir):
-                        todas_fotos.append(fotos_dir)
-                    
-                    os.unlink(temp_path)
+                # Cada lote é processado e suas fotos são gravadas no ZIP antes de o próximo ser lido,
+                # de modo que apenas um lote de PDFs ocupa o disco temporário por vez. Os artefatos
+                # finais são montados a partir dos resultados parciais em cache de cada PDF.
+                # Na saída determinística, o ZIP é montado ao final, com as entradas ordenadas.
+                buffer = BufferColunar()
+                linhas_relatorio = []
+                chaves = []
+                todas_fotos = []
+                zip_path = os.path.join(temp_dir, "fotos_extraidas.zip")
+                progresso = st.empty()
+                with nullcontext() if deterministico else zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for num_lote, lote in enumerate(em_lotes(pdfs, int(tamanho_lote)), 1):
+                        parciais_lote = processar_lote(lote, usar_ocr)
+                        for parcial in parciais_lote:
+                            buffer.adicionar(parcial['dados'])
+                            linhas_relatorio.append(parcial['linha_relatorio'])
+                            chaves.append(parcial['chave'])
+                        buffer.fechar_lote()
+                        fotos_lote = entradas_fotos(parciais_lote)
+                        todas_fotos.extend(fotos_lote)
+                        if not deterministico:
+                            gravar_fotos_zip(zipf, fotos_lote)
+                        progresso.info(f"Lote {num_lote} concluído: {len(chaves)} PDF(s) processado(s)")
                 
-                df_completo = pd.DataFrame(dados_completos).fillna('')
+                if not chaves:
+                    st.warning("⚠️ Nenhum PDF encontrado para processar.")
+                    return
                 
-                # Reorganiza as colunas para colocar "Data ART" ao lado de "Data"
-                colunas = list(df_completo.columns)
-                idx_data = colunas.index('Data')
-                if 'Data ART' in colunas:
-                    colunas.insert(idx_data + 1, colunas.pop(colunas.index('Data ART')))
-                if 'RF Principal' in colunas:
-                    colunas.insert(idx_data + 2, colunas.pop(colunas.index('RF Principal')))
-                if 'Regularização' in colunas:
-                    colunas.insert(idx_data + 3, colunas.pop(colunas.index('Regularização')))
+                df_completo = buffer.para_dataframe()
+                if deterministico:
+                    # Linhas em ordem de nome de arquivo, independente da ordem de envio
+                    ordem = sorted(range(len(chaves)), key=lambda i: (df_completo['Nome Arquivo'].iat[i], chaves[i]))
+                    df_completo = df_completo.iloc[ordem].reset_index(drop=True)
+                    linhas_relatorio = [linhas_relatorio[i] for i in ordem]
                 
-                df_completo = df_completo[colunas]
+                df_completo = df_completo[ordenar_colunas(list(df_completo.columns))]
                 
                 df_total = pd.DataFrame([{
                     'RF': 'TOTAL',
@@ -778,27 +1716,49 @@ def extrator_pdf_consolidado():
                     'Ofício': df_completo['Ofício'].sum(),
                     'Resposta Ofício': df_completo['Resposta Ofício'].sum()
                 }])
+                # Mantém os tipos das colunas (categóricas e inteiras) ao acrescentar a linha de totais
+                df_total = df_total.reindex(columns=df_completo.columns).astype(df_completo.dtypes.to_dict())
                 df_completo = pd.concat([df_completo, df_total], ignore_index=True)
                 
                 with st.expander("Visualizar dados extraídos", expanded=True):
                     st.dataframe(df_completo)
                 
-                pdf_completo = gerar_relatorio_completo(df_completo)
-                
-                excel_buffer = BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    df_completo.to_excel(writer, sheet_name='Dados Completos', index=False)
+                if deterministico:
+                    # Artefatos endereçados pelo conteúdo do lote: um lote repetido é servido do disco
+                    chave_lote = chave_artefatos(chaves)
+                    dir_artefatos = diretorio_artefatos(chave_lote)
+                    excel_path = os.path.join(dir_artefatos, "dados_completos.xlsx")
+                    relatorio_path = os.path.join(dir_artefatos, "relatorio_completo.pdf")
+                    zip_path = os.path.join(dir_artefatos, "fotos_extraidas.zip")
+                    if os.path.exists(os.path.join(dir_artefatos, "concluido")):
+                        os.utime(dir_artefatos)
+                        st.caption(f"Artefatos do lote {chave_lote[:12]} recuperados do cache.")
+                    else:
+                        os.makedirs(dir_artefatos, exist_ok=True)
+                        with open(excel_path, "wb") as f:
+                            f.write(gerar_excel(df_completo, DATA_FIXA))
+                        with open(relatorio_path, "wb") as f:
+                            f.write(gerar_relatorio_completo(df_completo, linhas_relatorio, DATA_FIXA))
+                        if todas_fotos:
+                            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                                gravar_fotos_zip(zipf, todas_fotos, DATA_FIXA)
+                        # O marcador é gravado por último: sua presença indica artefatos completos
+                        open(os.path.join(dir_artefatos, "concluido"), "w").close()
+                        st.caption(f"Artefatos do lote {chave_lote[:12]} gerados e armazenados em cache.")
                     
-                    colunas_resumo = ['RF', 'RF Principal', 'Fiscal', 'Supervisão', 'Data', 'Data ART', 'Regularização', 'Fato Gerador', 'Protocolo', 
-                                     'Identificação dos Contratados/Responsáveis', 'Autuação', 'Ações', 'Ofício', 'Resposta Ofício', 'Fotos']
-                    df_resumo = df_completo[[col for col in colunas_resumo if col in df_completo.columns]]
-                    df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
+                    with open(excel_path, "rb") as f:
+                        excel_bytes = f.read()
+                    with open(relatorio_path, "rb") as f:
+                        pdf_completo = f.read()
+                else:
+                    pdf_completo = gerar_relatorio_completo(df_completo, linhas_relatorio)
+                    excel_bytes = gerar_excel(df_completo)
                 
                 st.success("Extração concluída com sucesso!")
                 
                 st.download_button(
                     "⬇️ Baixar Excel Completo",
-                    excel_buffer.getvalue(),
+                    excel_bytes,
                     "dados_completos.xlsx",
                     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
@@ -811,15 +1771,6 @@ def extrator_pdf_consolidado():
                     )
                 
                 if todas_fotos:
-                    zip_path = os.path.join(temp_dir, "fotos_extraidas.zip")
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for foto_dir in todas_fotos:
-                            for root, _, files in os.walk(foto_dir):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    arcname = os.path.relpath(file_path, os.path.join(temp_dir, "fotos"))
-                                    zipf.write(file_path, arcname)
-                    
                     with open(zip_path, "rb") as f:
                         foto_zip = f.read()
                     
@@ -836,11 +1787,24 @@ def extrator_pdf_consolidado():
             limpar_temp_dir(temp_dir)
 
 # =================== INTERFACE PRINCIPAL ===================
+def exibir_diagnostico():
+    """Exibe os tempos de importação dos módulos pesados e de inicialização do app"""
+    registro = registro_diagnostico()
+    tempo_execucao = time.perf_counter() - _INICIO_SCRIPT
+    if registro['primeira_execucao'] is None:
+        registro['primeira_execucao'] = tempo_execucao
+    
+    with st.expander("Diagnóstico", expanded=False):
+        st.write(f"Inicialização (primeira execução): {registro['primeira_execucao']:.3f}s")
+        st.write(f"Execução atual do script: {tempo_execucao:.3f}s")
+        if registro['importacoes']:
+            for nome, tempo in registro['importacoes'].items():
+                st.write(f"Importação de `{nome}`: {tempo:.3f}s")
+        else:
+            st.write("Nenhum módulo pesado importado até o momento.")
+
 def main():
-    try:
-        logo = Image.open("10.png")
-    except:
-        logo = None
+    logo = carregar_logo()
     
     col1, col2 = st.columns([1, 2])
     with col1:
@@ -850,7 +1814,12 @@ def main():
     
     st.markdown("")
     extrator_pdf_consolidado()
+    busca_rfs_processados()
     st.markdown("2025 - Carlos Franklin")
+    exibir_diagnostico()
 
 if __name__ == "__main__":
+    # Modo de validação: python Extra.py --validar-corpus <diretório> [--atualizar]
+    if '--validar-corpus' in sys.argv[1:]:
+        sys.exit(main_cli(sys.argv[1:]))
     main()
\ No newline at end of file